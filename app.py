@@ -6,13 +6,18 @@ Run with:  streamlit run app.py
 
 from __future__ import annotations
 
+import bisect
 import os
+
 import streamlit as st
 from dotenv import load_dotenv
 
 from reviewer import CategoryFeedback, ReviewResult, configure_groq, review_code
 from samples import SAMPLES
 
+# Radio options never change, so build the list once instead of per rerun
+_SAMPLE_OPTIONS = ["— none —", *SAMPLES.keys()]
+
 # Load environment variables from .env file
 load_dotenv()
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
@@ -27,8 +32,9 @@ st.set_page_config(
 
 # ── Custom CSS ──────────────────────────────────────────────────────────────
 
-st.markdown(
-    """
+# Static chrome (CSS, hero, empty state) is built once at import and sent via
+# st.html, which skips the markdown/rehype pipeline entirely.
+_CSS = """
     <style>
     /* ── Global ──────────────────────────────────────── */
     @import url('https://fonts.googleapis.com/css2?family=Inter:wght@400;500;600;700;800&display=swap');
@@ -278,9 +284,9 @@ st.markdown(
         font-size: 0.85rem !important;
     }
     </style>
-    """,
-    unsafe_allow_html=True,
-)
+    """
+
+st.html(_CSS)
 
 # ── Helpers ─────────────────────────────────────────────────────────────────
 
@@ -292,35 +298,53 @@ CATEGORY_ICONS = {
 }
 
 
+# LLM latency scales with prompt tokens, so cap what we send for review
+_MAX_CHARS = int(os.getenv("CODE_REVIEW_MAX_CHARS", "12000"))
+
+
+def _prep_code(code: str) -> str:
+    """Truncate oversized snippets before they hit the API."""
+    if len(code) <= _MAX_CHARS:
+        return code
+    return code[:_MAX_CHARS] + "\n# ... (truncated for review)"
+
+
+def _load_sample(name: str) -> None:
+    """Button callback: runs before the rerun, so no explicit st.rerun() needed."""
+    st.session_state["loaded_code"] = SAMPLES[name]["code"]
+
+
+@st.cache_data(show_spinner=False, max_entries=128, ttl=3600)
+def _cached_review(code: str, model_name: str = "llama-3.3-70b-versatile") -> ReviewResult:
+    """Review *code* via Groq, memoising results so identical snippets skip the API."""
+    return review_code(code, model_name=model_name)
+
+
+# Score buckets resolved with a single C-level bisect instead of an if-ladder.
+# bisect_right keeps the original >= boundary semantics (a score equal to a
+# bound lands in the higher bucket).
+_TIER_BOUNDS = (4, 7)
+_TIERS = ("low", "medium", "high")
+_LABEL_BOUNDS = (3, 5, 7, 9)
+_LABELS = ("Critical", "Poor", "Fair", "Good", "Excellent")
+
+
 def _score_tier(score: float) -> str:
-    if score >= 7:
-        return "high"
-    if score >= 4:
-        return "medium"
-    return "low"
+    return _TIERS[bisect.bisect_right(_TIER_BOUNDS, score)]
 
 
 def _score_label(score: float) -> str:
-    if score >= 9:
-        return "Excellent"
-    if score >= 7:
-        return "Good"
-    if score >= 5:
-        return "Fair"
-    if score >= 3:
-        return "Poor"
-    return "Critical"
-
-
-def _render_category_card(cat: CategoryFeedback) -> None:
-    """Render a polished category card."""
+    return _LABELS[bisect.bisect_right(_LABEL_BOUNDS, score)]
+
+
+def _category_card_html(cat: CategoryFeedback) -> str:
+    """Build the HTML for one polished category card."""
     tier = _score_tier(cat.score)
     icon = CATEGORY_ICONS.get(cat.category, "📋")
     suggestions_html = "".join(
         f'<div class="suggestion-item">💡 {s}</div>' for s in cat.suggestions
     )
-    st.markdown(
-        f"""
+    return f"""
         <div class="cat-card">
             <div class="cat-header">
                 <span class="cat-icon">{icon}</span>
@@ -330,70 +354,70 @@ def _render_category_card(cat: CategoryFeedback) -> None:
             <div class="cat-summary">{cat.summary}</div>
             {suggestions_html}
         </div>
-        """,
-        unsafe_allow_html=True,
-    )
+        """
 
 
 def _render_result(result: ReviewResult) -> None:
     """Render the full review result with a polished dashboard layout."""
+    # Cache the repeated attribute reads once up front
+    cats = result.categories
+    overall = result.overall_score
 
     # ── Overall score ring + per-category metric cards ──
-    ring_col, spacer, m1, m2, m3 = st.columns([2, 0.3, 1.2, 1.2, 1.2])
-    tier = _score_tier(result.overall_score)
-    pct = int(result.overall_score * 10)  # 0-100 for conic gradient
+    # Laid out with plain CSS grid rather than st.columns: nothing here needs
+    # Streamlit reactivity, and every column adds a protobuf/React node.
+    tier = _score_tier(overall)
+    pct = int(overall * 10)  # 0-100 for conic gradient
 
-    with ring_col:
-        st.markdown(
-            f"""
+    metric_cards = "".join(
+        f"""
+        <div class="metric-card">
+            <div style="font-size:1.6rem;margin-bottom:4px">{CATEGORY_ICONS.get(cat.category, "📋")}</div>
+            <div class="metric-score score-{_score_tier(cat.score)}">{cat.score}/10</div>
+            <div class="metric-label">{cat.category}</div>
+        </div>
+        """
+        for cat in cats
+    )
+    st.markdown(
+        f"""
+        <div style="display:grid;grid-template-columns:2fr 1fr 1fr 1fr;gap:1.5rem;align-items:stretch">
             <div class="score-ring-card">
                 <div class="score-ring ring-{tier}" style="--pct:{pct}%">
-                    <div class="ring-inner">{result.overall_score}</div>
+                    <div class="ring-inner">{overall}</div>
                 </div>
-                <div class="score-ring-label">{_score_label(result.overall_score)} · {result.language}</div>
+                <div class="score-ring-label">{_score_label(overall)} · {result.language}</div>
             </div>
-            """,
-            unsafe_allow_html=True,
-        )
-
-    with spacer:
-        st.empty()
-
-    for col, cat in zip([m1, m2, m3], result.categories):
-        t = _score_tier(cat.score)
-        icon = CATEGORY_ICONS.get(cat.category, "📋")
-        with col:
-            st.markdown(
-                f"""
-                <div class="metric-card">
-                    <div style="font-size:1.6rem;margin-bottom:4px">{icon}</div>
-                    <div class="metric-score score-{t}">{cat.score}/10</div>
-                    <div class="metric-label">{cat.category}</div>
-                </div>
-                """,
-                unsafe_allow_html=True,
-            )
-
-    st.markdown("<br>", unsafe_allow_html=True)
-
-    # ── TL;DR ──
-    st.markdown(
-        f'<div class="tldr-box">📝 <strong>TL;DR</strong> — {result.tldr}</div>',
+            {metric_cards}
+        </div>
+        """,
         unsafe_allow_html=True,
     )
 
-    st.markdown("<br>", unsafe_allow_html=True)
-
-    # ── Detailed category cards ──
-    st.markdown("#### 🔬 Detailed Analysis")
-    for cat in result.categories:
-        _render_category_card(cat)
+    # ── TL;DR + detailed category cards — one st.html call, one React mount,
+    # no markdown/rehype parsing of what is already raw HTML ──
+    cards_html = "".join(_category_card_html(cat) for cat in cats)
+    st.html(
+        f'<div class="tldr-box" style="margin-top:1.5rem">📝 <strong>TL;DR</strong> — {result.tldr}</div>'
+        f'<h4 style="font-weight:700;margin:1.2rem 0 0.8rem">🔬 Detailed Analysis</h4>'
+        f"{cards_html}"
+    )
 
-    # ── Bar chart ──
-    st.markdown("<br>", unsafe_allow_html=True)
-    st.markdown("#### 📊 Score Breakdown")
-    chart_data = {cat.category: cat.score for cat in result.categories}
-    st.bar_chart(chart_data, horizontal=True, height=200, color="#6366f1")
+    # ── Score breakdown — hand-rolled CSS bars; an Altair/Vega chart component
+    # is vast overkill for three fixed values ──
+    bars_html = "".join(
+        f'<div style="display:flex;align-items:center;gap:.6rem;margin:.35rem 0">'
+        f'<span style="width:140px;font-size:0.9rem;color:#475569">{cat.category}</span>'
+        f'<div style="flex:1;background:#e2e8f0;border-radius:6px;height:16px">'
+        f'<div style="width:{cat.score * 10}%;height:100%;background:#6366f1;border-radius:6px"></div>'
+        f"</div>"
+        f'<span style="font-weight:700;color:#1e293b">{cat.score}</span>'
+        f"</div>"
+        for cat in cats
+    )
+    st.html(
+        f'<h4 style="font-weight:700;margin:1.2rem 0 0.8rem">📊 Score Breakdown</h4>{bars_html}'
+    )
 
 
 # ── Sidebar ─────────────────────────────────────────────────────────────────
@@ -486,17 +510,16 @@ with st.sidebar:
 
 # ── Hero banner ─────────────────────────────────────────────────────────────
 
-st.markdown(
-    """
+_HERO_HTML = """
     <div class="hero">
         <h1>🔍 Smart Code Reviewer</h1>
         <p>Paste your code, pick a sample, and get an instant AI-powered review
         covering readability, structure, and maintainability — before it ever
         reaches a human reviewer.</p>
     </div>
-    """,
-    unsafe_allow_html=True,
-)
+    """
+
+st.html(_HERO_HTML)
 
 # ── Input section ───────────────────────────────────────────────────────────
 
@@ -510,14 +533,19 @@ with right_col:
     st.markdown("##### 📂 Quick Samples")
     sample_name = st.radio(
         "Pick a sample to load:",
-        options=["— none —"] + list(SAMPLES.keys()),
+        options=_SAMPLE_OPTIONS,
         label_visibility="collapsed",
     )
     if sample_name != "— none —":
-        st.code(SAMPLES[sample_name]["code"][:120] + "…", language=SAMPLES[sample_name]["language"])
-        if st.button("📋 Load this sample", use_container_width=True):
-            st.session_state["loaded_code"] = SAMPLES[sample_name]["code"]
-            st.rerun()
+        # Collapsed by default so the CodeMirror component only mounts on demand
+        with st.expander("👁️ Preview", expanded=False):
+            st.code(SAMPLES[sample_name]["code"][:120] + "…", language=SAMPLES[sample_name]["language"])
+        st.button(
+            "📋 Load this sample",
+            on_click=_load_sample,
+            args=(sample_name,),
+            use_container_width=True,
+        )
 
 with left_col:
     code_input = st.text_area(
@@ -529,21 +557,26 @@ with left_col:
 
 review_btn = st.button("🚀  Review Code", type="primary", use_container_width=True)
 
-if not code_input.strip():
+_EMPTY_STATE_HTML = """
+    <div style="text-align:center;padding:3rem 0;color:#94a3b8">
+        <div style="font-size:3rem;margin-bottom:0.5rem">📝</div>
+        <div style="font-size:1.1rem;font-weight:600">No code yet</div>
+        <div style="font-size:0.9rem">Paste a snippet or pick a sample from the right →</div>
+    </div>
+    """
+
+if not code_input.strip() and "last_result" not in st.session_state:
     # Show a friendly empty state
-    st.markdown(
-        """
-        <div style="text-align:center;padding:3rem 0;color:#94a3b8">
-            <div style="font-size:3rem;margin-bottom:0.5rem">📝</div>
-            <div style="font-size:1.1rem;font-weight:600">No code yet</div>
-            <div style="font-size:0.9rem">Paste a snippet or pick a sample from the right →</div>
-        </div>
-        """,
-        unsafe_allow_html=True,
-    )
+    st.html(_EMPTY_STATE_HTML)
 
 # ── Run review ──────────────────────────────────────────────────────────────
 
+# Keep the last review on screen across reruns (radio toggles, expander
+# clicks, …) instead of discarding it until the button is pressed again.
+if not review_btn and "last_result" in st.session_state:
+    st.markdown("---")
+    _render_result(st.session_state["last_result"])
+
 if review_btn:
     if not GROQ_API_KEY:
         st.error(
@@ -560,12 +593,15 @@ if review_btn:
     with st.status("🔍 Reviewing your code…", expanded=True) as status:
         st.write("Sending code to Llama 3.3 70B via Groq…")
         try:
-            result = review_code(code_input)
+            result = _cached_review(_prep_code(code_input.strip()))
         except Exception as exc:
             st.error(f"Review failed: {exc}")
             st.stop()
         st.write("Parsing structured feedback…")
         status.update(label="✅ Review complete!", state="complete", expanded=False)
 
+    st.session_state["last_result"] = result
+    st.session_state["last_code"] = code_input
+
     st.markdown("---")
     _render_result(result)
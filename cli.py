@@ -1,16 +1,25 @@
 """Command-line interface for Smart Code Reviewer pre-commit hook."""
 
+from __future__ import annotations
+
+import bisect
+import dataclasses
+import hashlib
+import json
 import os
+import sqlite3
 import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import TYPE_CHECKING
 
-from dotenv import load_dotenv
-
-from reviewer import configure_groq, review_code
+if TYPE_CHECKING:
+    from reviewer import ReviewResult
 
-# Load API key from .env
-load_dotenv()
-GROQ_API_KEY = os.getenv("GROQ_API_KEY")
+# dotenv and reviewer (which pulls in the Groq SDK) are imported lazily inside
+# main()/review_file() so the common pre-commit no-op run — zero matching
+# files — pays no import cost beyond the stdlib.
 
 # ANSI color codes
 class Color:
@@ -32,61 +41,202 @@ def colored(text: str, color: str) -> str:
     return f"{color}{text}{Color.RESET}"
 
 
+# Status strings are identical for every file, so build them once instead of
+# re-concatenating ANSI codes inside the per-file loop.
+_PASS_STATUS = f"{Color.GREEN}✅{Color.RESET}"
+_FAIL_STATUS = f"{Color.RED}⚠️{Color.RESET}"
+_TIER_EMOJI = (
+    f"{Color.RED}🔴{Color.RESET}",
+    f"{Color.YELLOW}🟡{Color.RESET}",
+    f"{Color.GREEN}🟢{Color.RESET}",
+)
+_EMOJI_BOUNDS = (5, 7)  # score >= 7 → green, >= 5 → yellow, else red
+
+# Extensions we consider reviewable code
+_CODE_EXTS: frozenset[str] = frozenset(
+    {".py", ".js", ".jsx", ".ts", ".tsx", ".go", ".rs", ".cpp", ".c", ".java"}
+)
+
+# LLM latency scales with prompt tokens, so cap what we send for review
+_MAX_CHARS = int(os.getenv("CODE_REVIEW_MAX_CHARS", "12000"))
+
+
+def _prep_code(code: str) -> str:
+    """Truncate oversized files before they hit the API."""
+    if len(code) <= _MAX_CHARS:
+        return code
+    return code[:_MAX_CHARS] + "\n# ... (truncated for review)"
+
+
+# ── On-disk review cache ─────────────────────────────────────────────────────
+#
+# Unchanged files are re-reviewed on every commit otherwise, burning API quota.
+# Reviews are keyed by the SHA-256 of the file contents and stored in a small
+# sqlite database, so repeat hook runs become microsecond hash lookups.
+
+_CACHE_PATH = Path.home() / ".cache" / "smart-code-reviewer" / "reviews.db"
+_cache_conn: sqlite3.Connection | None = None
+_cache_lock = threading.Lock()
+
+
+def _cache_connect() -> sqlite3.Connection:
+    """Return the singleton cache connection, creating the database on first use."""
+    global _cache_conn
+    if _cache_conn is None:
+        _CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+        _cache_conn = sqlite3.connect(_CACHE_PATH, check_same_thread=False)
+        _cache_conn.execute(
+            "CREATE TABLE IF NOT EXISTS reviews (hash TEXT PRIMARY KEY, payload TEXT)"
+        )
+        try:
+            _cache_conn.execute("ALTER TABLE reviews ADD COLUMN norm_hash TEXT")
+        except sqlite3.OperationalError:
+            pass  # column already present
+        _cache_conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_reviews_norm_hash ON reviews (norm_hash)"
+        )
+        _cache_conn.commit()
+    return _cache_conn
+
+
+# Line-comment prefix per reviewable extension. Stripping the wrong prefix is
+# worse than stripping none: "#" opens a private field in JS/TS, not a comment.
+_COMMENT_PREFIXES: dict[str, str] = {
+    ".py": "#",
+    ".js": "//",
+    ".jsx": "//",
+    ".ts": "//",
+    ".tsx": "//",
+    ".go": "//",
+    ".rs": "//",
+    ".cpp": "//",
+    ".c": "//",
+    ".java": "//",
+}
+
+
+def _normalized_hash(code: str, suffix: str) -> str:
+    """Hash the code with blank lines, comment lines and trailing whitespace removed.
+
+    Whitespace- or comment-only edits leave this hash unchanged, so they reuse
+    the previous review instead of triggering a fresh API call. Which lines
+    count as comments depends on the file's language, keyed by its suffix.
+    """
+    prefix = _COMMENT_PREFIXES.get(suffix)
+    norm = "\n".join(
+        line.rstrip()
+        for line in code.splitlines()
+        if line.strip() and not (prefix and line.lstrip().startswith(prefix))
+    )
+    return hashlib.sha256(norm.encode()).hexdigest()
+
+
+def _cache_get(content_hash: str, norm_hash: str | None = None) -> ReviewResult | None:
+    """Look up a stored review by exact content hash, then by normalized hash."""
+    try:
+        with _cache_lock:
+            conn = _cache_connect()
+            row = conn.execute(
+                "SELECT payload FROM reviews WHERE hash = ?", (content_hash,)
+            ).fetchone()
+            if row is None and norm_hash is not None:
+                row = conn.execute(
+                    "SELECT payload FROM reviews WHERE norm_hash = ?", (norm_hash,)
+                ).fetchone()
+        if row is None:
+            return None
+        from reviewer import CategoryFeedback, ReviewResult
+
+        data = json.loads(row[0])
+        data["categories"] = [CategoryFeedback(**cat) for cat in data["categories"]]
+        return ReviewResult(**data)
+    except (OSError, sqlite3.Error, json.JSONDecodeError, TypeError):
+        return None  # a broken (or uncreatable) cache should never block the hook
+
+
+def _cache_put(content_hash: str, norm_hash: str, result: ReviewResult) -> None:
+    """Persist a review so the next run of the hook can skip the API call."""
+    try:
+        payload = json.dumps(dataclasses.asdict(result))
+        with _cache_lock:
+            conn = _cache_connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO reviews (hash, payload, norm_hash) VALUES (?, ?, ?)",
+                (content_hash, payload, norm_hash),
+            )
+            conn.commit()
+    except (OSError, sqlite3.Error):
+        pass
+
+
 def review_file(file_path: str, threshold: float = 6.0, verbose: bool = True) -> tuple[bool, str, float]:
     """Review a single file and return (passed, message, score)."""
-    if not Path(file_path).exists():
+    # Skip non-code files first — a suffix compare is cheaper than a stat
+    path = Path(file_path)
+    if path.suffix not in _CODE_EXTS:
+        return True, f"{Color.GRAY}⏭️  {file_path} (skipped: not code){Color.RESET}", 0.0
+
+    try:
+        stat = path.stat()
+    except OSError:
         return True, f"{Color.GRAY}⏭️  {file_path} (skipped: not found){Color.RESET}", 0.0
 
-    # Skip non-code files
-    code_extensions = {".py", ".js", ".jsx", ".ts", ".tsx", ".go", ".rs", ".cpp", ".c", ".java"}
-    if Path(file_path).suffix not in code_extensions:
-        return True, f"{Color.GRAY}⏭️  {file_path} (skipped: not code){Color.RESET}", 0.0
+    # Reject huge (generated/minified) files before reading them
+    max_bytes = int(os.getenv("MAX_REVIEW_BYTES", "50000"))
+    if stat.st_size > max_bytes:
+        return True, f"{Color.GRAY}⏭️  {file_path} (skipped: too large){Color.RESET}", 0.0
 
     try:
-        with open(file_path, "r", encoding="utf-8") as f:
-            code = f.read()
+        code = path.read_text(encoding="utf-8", errors="replace")
 
         if not code.strip():
             return True, f"{Color.GRAY}⏭️  {file_path} (skipped: empty){Color.RESET}", 0.0
 
-        result = review_code(code)
+        content_hash = hashlib.sha256(code.encode()).hexdigest()
+        norm_hash = _normalized_hash(code, path.suffix)
+        result = _cache_get(content_hash, norm_hash)
+        if result is None:
+            from reviewer import review_code
+
+            result = review_code(_prep_code(code))
+            _cache_put(content_hash, norm_hash, result)
 
         # Check if it passes threshold
         passed = result.overall_score >= threshold
         
         if passed:
-            status = colored("✅", Color.GREEN)
+            status = _PASS_STATUS
             file_color = Color.GREEN
         else:
-            status = colored("⚠️", Color.RED)
+            status = _FAIL_STATUS
             file_color = Color.YELLOW
         
-        # Build detailed message
+        # Build detailed message — collect parts and join once rather than
+        # repeated str += (quadratic for long verbose reports)
         file_name_colored = colored(file_path, file_color)
         score_colored = colored(f"{result.overall_score}/10", file_color)
-        message = f"\n{status} {file_name_colored}\n"
-        message += f"   Score: {score_colored} ({result.language})\n"
-        message += f"   {Color.CYAN}TL;DR:{Color.RESET} {result.tldr}\n"
-        
+        parts = [
+            f"\n{status} {file_name_colored}\n",
+            f"   Score: {score_colored} ({result.language})\n",
+            f"   {Color.CYAN}TL;DR:{Color.RESET} {result.tldr}\n",
+        ]
+
         if verbose and not passed:
-            message += f"\n   {Color.BLUE}📊 Detailed Feedback:{Color.RESET}\n"
+            parts.append(f"\n   {Color.BLUE}📊 Detailed Feedback:{Color.RESET}\n")
             for cat in result.categories:
-                if cat.score >= 7:
-                    score_emoji = colored("🟢", Color.GREEN)
-                elif cat.score >= 5:
-                    score_emoji = colored("🟡", Color.YELLOW)
-                else:
-                    score_emoji = colored("🔴", Color.RED)
-                
+                score_emoji = _TIER_EMOJI[bisect.bisect_right(_EMOJI_BOUNDS, cat.score)]
+
                 cat_name = colored(f"{cat.category}: {cat.score}/10", Color.CYAN)
-                message += f"\n   {score_emoji} {cat_name}\n"
-                message += f"       {cat.summary}\n"
+                parts.append(f"\n   {score_emoji} {cat_name}\n")
+                parts.append(f"       {cat.summary}\n")
                 if cat.suggestions:
-                    message += f"       {Color.GRAY}Suggestions to improve:{Color.RESET}\n"
-                    for i, suggestion in enumerate(cat.suggestions, 1):
-                        message += f"       {i}. {suggestion}\n"
-        
-        return passed, message, result.overall_score
+                    parts.append(f"       {Color.GRAY}Suggestions to improve:{Color.RESET}\n")
+                    parts.extend(
+                        f"       {i}. {suggestion}\n"
+                        for i, suggestion in enumerate(cat.suggestions, 1)
+                    )
+
+        return passed, "".join(parts), result.overall_score
 
     except Exception as e:
         error_msg = colored(f"❌ {file_path}: Error — {str(e)[:80]}", Color.RED)
@@ -98,54 +248,74 @@ def main(argv: list[str] | None = None) -> int:
     if argv is None:
         argv = sys.argv[1:]
 
-    if not GROQ_API_KEY:
+    file_paths = argv if argv else []
+
+    if not file_paths:
+        print(f"{Color.BLUE}ℹ️  No files to review{Color.RESET}")
+        return 0
+
+    from dotenv import load_dotenv
+
+    from reviewer import configure_groq
+
+    # Load API key from .env
+    load_dotenv()
+    groq_api_key = os.getenv("GROQ_API_KEY")
+    if not groq_api_key:
         print(colored("❌ GROQ_API_KEY not set in .env", Color.RED))
         print(f"   {Color.GRAY}Please add your Groq API key to .env file{Color.RESET}")
         return 1
 
-    configure_groq(GROQ_API_KEY)
+    configure_groq(groq_api_key)
 
     # Get threshold from environment or use default
     threshold = float(os.getenv("CODE_REVIEW_THRESHOLD", "6.0"))
-    
+
     # Verbose mode (show all details for failures)
     verbose = os.getenv("VERBOSE", "1") == "1"
 
     failed_files: list[tuple[str, float]] = []
-    file_paths = argv if argv else []
-
-    if not file_paths:
-        print(f"{Color.BLUE}ℹ️  No files to review{Color.RESET}")
-        return 0
 
+    # Buffer all output and emit it with a single write at the end — print()
+    # flushes per call, and N files × M lines of syscalls adds up. Buffering
+    # also keeps thread-pool results from ever interleaving on screen.
     header = f"🔍 Smart Code Reviewer (threshold: {colored(str(threshold), Color.CYAN)}/10)"
-    print(f"\n{Color.BOLD}{header}{Color.RESET}\n")
+    out_buf: list[str] = [f"\n{Color.BOLD}{header}{Color.RESET}\n\n"]
 
-    for file_path in file_paths:
-        passed, message, score = review_file(file_path, threshold, verbose=verbose)
-        print(message)
+    # Reviews are I/O-bound on the Groq API, so overlap them across threads.
+    # Results are printed in the original file order once the pool drains.
+    max_workers = min(int(os.getenv("CODE_REVIEW_WORKERS", "4")), len(file_paths))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = list(executor.map(lambda fp: review_file(fp, threshold, verbose=verbose), file_paths))
+
+    for file_path, (passed, message, score) in zip(file_paths, results):
+        out_buf.append(message + "\n")
 
         if not passed:
             failed_files.append((file_path, score))
 
     # Summary section
-    print(f"\n{Color.BOLD}{'─' * 70}{Color.RESET}")
-    
+    out_buf.append(f"\n{Color.BOLD}{'─' * 70}{Color.RESET}\n")
+
     if failed_files:
         # Red highlighted header
         failed_header = f"{Color.BG_RED}{Color.WHITE}{Color.BOLD} ❌ {len(failed_files)} FILE(S) BELOW THRESHOLD {Color.RESET}"
-        print(f"\n{failed_header}\n")
-        
+        out_buf.append(f"\n{failed_header}\n\n")
+
         for file_path, score in failed_files:
             # Red background for each failed file line
             file_line = f"{Color.BG_RED}{Color.WHITE}{Color.BOLD} {file_path}: {score}/10 {Color.RESET}"
-            print(f"   {file_line}")
-        
-        print(f"\n{Color.YELLOW}💡 Tip: Fix the issues above to improve your scores!{Color.RESET}\n")
+            out_buf.append(f"   {file_line}\n")
+
+        out_buf.append(f"\n{Color.YELLOW}💡 Tip: Fix the issues above to improve your scores!{Color.RESET}\n\n")
+        sys.stdout.write("".join(out_buf))
+        sys.stdout.flush()
         return 1
 
     success_msg = colored("✅ All files passed review!", Color.GREEN)
-    print(f"\n{Color.BOLD}{success_msg}{Color.RESET}\n")
+    out_buf.append(f"\n{Color.BOLD}{success_msg}{Color.RESET}\n\n")
+    sys.stdout.write("".join(out_buf))
+    sys.stdout.flush()
     return 0
 
 
@@ -9,38 +9,65 @@ Uses Groq (free tier) to review code for:
 
 from __future__ import annotations
 
+import asyncio
+import functools
+import hashlib
+import importlib.util
 import json
+import os
 import re
 import textwrap
-from dataclasses import dataclass, field
-
-from groq import Groq
+import threading
+import warnings
+from collections import OrderedDict
+from dataclasses import dataclass
+from operator import itemgetter
+
+import httpx
+from groq import AsyncGroq, Groq
+
+# orjson parses the kilobyte-scale review JSON several times faster than the
+# stdlib and interns repeated schema keys; fall back silently when absent.
+try:
+    from orjson import loads as _loads
+except ImportError:
+    _loads = json.loads
 
 # ── Models ──────────────────────────────────────────────────────────────────
 
 REVIEW_CATEGORIES = ("Readability", "Structure", "Maintainability")
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class CategoryFeedback:
     """Feedback for a single review category."""
 
     category: str
     score: int  # 1-10
     summary: str
-    suggestions: list[str] = field(default_factory=list)
+    suggestions: tuple[str, ...] = ()
+
+    def __post_init__(self) -> None:
+        # Accept any iterable (the parser hands us lists) but store a tuple
+        # so instances stay immutable and hashable.
+        if not isinstance(self.suggestions, tuple):
+            object.__setattr__(self, "suggestions", tuple(self.suggestions))
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class ReviewResult:
     """Complete review result returned by the analyser."""
 
     language: str
-    categories: list[CategoryFeedback]
+    categories: tuple[CategoryFeedback, ...]
     overall_score: float
     tldr: str
     raw_response: str = ""
 
+    def __post_init__(self) -> None:
+        if not isinstance(self.categories, tuple):
+            object.__setattr__(self, "categories", tuple(self.categories))
+
 
 # ── Prompt ──────────────────────────────────────────────────────────────────
 
@@ -115,25 +142,273 @@ SYSTEM_PROMPT = textwrap.dedent("""\
     • If code is perfect in a category, set score to 9-10 and keep suggestions empty
 """)
 
+# Trim trailing whitespace — fewer prompt tokens for identical instructions.
+# The system message must stay byte-identical across calls so provider-side
+# prompt-prefix (KV) caching can hit; build the message dict once and reuse it.
+SYSTEM_PROMPT = "\n".join(line.rstrip() for line in SYSTEM_PROMPT.splitlines()).strip()
+
+_SYSTEM_MSG = {"role": "system", "content": SYSTEM_PROMPT}
 
 
 # ── Analyser ────────────────────────────────────────────────────────────────
 
 _client: Groq | None = None
+_aclient: AsyncGroq | None = None
+_api_key: str | None = None
+_async_api_key: str | None = None
+
+# One shared connection pool per process: tearing down the httpx client on
+# reconfiguration throws away warm TLS sessions (~100 ms handshake per call).
+# HTTP/2 multiplexing is enabled when the optional h2 package is installed.
+_HTTP2 = importlib.util.find_spec("h2") is not None
+_HTTP_LIMITS = httpx.Limits(max_keepalive_connections=16, max_connections=32)
+_shared_http: httpx.Client | None = None
+_shared_http_async: httpx.AsyncClient | None = None
+
+
+def _http_client() -> httpx.Client:
+    global _shared_http
+    if _shared_http is None:
+        _shared_http = httpx.Client(http2=_HTTP2, limits=_HTTP_LIMITS, timeout=30.0)
+    return _shared_http
+
+
+def _http_client_async() -> httpx.AsyncClient:
+    global _shared_http_async
+    if _shared_http_async is None:
+        _shared_http_async = httpx.AsyncClient(http2=_HTTP2, limits=_HTTP_LIMITS, timeout=30.0)
+    return _shared_http_async
+
+# In-process LRU cache of completed reviews. The LLM round-trip dominates both
+# wall time and cost, so an identical (model, prompt, code) tuple should never
+# hit the API twice. Keyed by SHA-256 over all three inputs.
+_CACHE_MAX = 512
+_review_cache: OrderedDict[str, ReviewResult] = OrderedDict()
+# The CLI calls review_code from a thread pool; without a lock, a get/
+# move_to_end pair can race an eviction and KeyError. Dict ops are quick, so
+# one lock over every cache touch is cheap.
+_review_cache_lock = threading.Lock()
+
+
+def _cache_key(model_name: str, code: str) -> str:
+    return hashlib.sha256(f"{model_name}\x00{SYSTEM_PROMPT}\x00{code}".encode()).hexdigest()
+
+
+_BLANK_RUN_RE = re.compile(r"\n{3,}")
+
+
+def _normalize_code(code: str) -> str:
+    """Canonicalise whitespace so trivially-different submissions share a cache key."""
+    stripped = "\n".join(line.rstrip() for line in code.splitlines())
+    return _BLANK_RUN_RE.sub("\n\n", stripped).strip()
+
+
+# Optional fuzzy matching: a 64-bit SimHash over token 5-shingles lets
+# near-duplicate submissions (one edited line in a big snippet) reuse the
+# previous review. Off by default — set CODE_REVIEW_FUZZY_CACHE=1 to enable.
+_FUZZY_CACHE = os.getenv("CODE_REVIEW_FUZZY_CACHE", "0") == "1"
+_FUZZY_MAX_DISTANCE = 3
+_fuzzy_index: list[tuple[int, str]] = []  # (simhash, cache key)
+
+
+def _simhash(text: str) -> int:
+    """64-bit SimHash over 5-token shingles of *text*."""
+    tokens = text.split()
+    weights = [0] * 64
+    for i in range(max(len(tokens) - 4, 1)):
+        shingle = " ".join(tokens[i : i + 5]).encode()
+        h = int.from_bytes(hashlib.blake2b(shingle, digest_size=8).digest(), "big")
+        for bit in range(64):
+            weights[bit] += 1 if (h >> bit) & 1 else -1
+    return sum(1 << bit for bit, w in enumerate(weights) if w > 0)
+
+
+def _fuzzy_lookup(fingerprint: int) -> str | None:
+    """Return the cache key of a stored review within Hamming distance 3, if any."""
+    for stored, key in _fuzzy_index:
+        if (fingerprint ^ stored).bit_count() <= _FUZZY_MAX_DISTANCE:
+            return key
+    return None
 
 
 def configure_groq(api_key: str) -> None:
-    """Create a Groq client with the given API key."""
-    global _client
-    _client = Groq(api_key=api_key)
+    """Create a Groq client with the given API key.
+
+    Idempotent: reconfiguring with the same key keeps the existing client
+    (and its warm connection pool) instead of rebuilding it.
+    """
+    global _client, _api_key
+    if _client is not None and _api_key == api_key:
+        return
+    _client = Groq(api_key=api_key, http_client=_http_client())
+    _api_key = api_key
+
 
+def configure_groq_async(api_key: str) -> None:
+    """Create an AsyncGroq client with the given API key. Idempotent like configure_groq."""
+    global _aclient, _async_api_key
+    if _aclient is not None and _async_api_key == api_key:
+        return
+    _aclient = AsyncGroq(api_key=api_key, http_client=_http_client_async())
+    _async_api_key = api_key
 
-def _extract_json(text: str) -> dict:
+
+def _extract_json(text: str) -> dict | list:
     """Best-effort extraction of JSON from the model's response."""
-    # Strip markdown code fences if present
-    cleaned = re.sub(r"```(?:json)?\s*", "", text)
-    cleaned = cleaned.strip().rstrip("`")
-    return json.loads(cleaned)
+    # The payload always sits between the first and last structural character,
+    # so two memchr-style scans (find + rfind) locate it directly — cheaper
+    # than strip()'s double pass plus fence bookkeeping, and it drops any
+    # surrounding fences or prose for free. Arrays come from the batch path.
+    obj_start = text.find("{")
+    arr_start = text.find("[")
+    if arr_start != -1 and (obj_start == -1 or arr_start < obj_start):
+        start, end = arr_start, text.rfind("]")
+    else:
+        start, end = obj_start, text.rfind("}")
+    if start < 0 or end < start:
+        raise ValueError("No JSON payload found in model response")
+    return _loads(text[start : end + 1])
+
+
+def _parse_response(raw: str) -> dict | list:
+    """Parse a response that should already be bare JSON, falling back to fence stripping."""
+    # JSON mode (response_format) returns bare JSON; keep the fence-stripping
+    # path for models that ignore or don't support it.
+    try:
+        return _loads(raw)
+    except ValueError:
+        return _extract_json(raw)
+
+
+# Hard input cap: network upload and LLM compute scale linearly with code
+# size, and a 500 KB paste buys almost no extra review signal. Callers may
+# pre-truncate lower (CODE_REVIEW_MAX_CHARS); this is the engine's backstop.
+MAX_CODE_CHARS = 32_000
+
+
+@functools.lru_cache(maxsize=1)
+def _warn_truncated() -> None:
+    """Warn once per process that oversized inputs are truncated."""
+    warnings.warn(
+        f"Code longer than {MAX_CODE_CHARS} characters is truncated before review",
+        stacklevel=4,
+    )
+
+
+def _truncate_code(code: str) -> str:
+    if len(code) <= MAX_CODE_CHARS:
+        return code
+    _warn_truncated()
+    return code[:MAX_CODE_CHARS] + "\n# ...truncated..."
+
+
+# User-message frame for single-snippet reviews; joining (pre, code, post)
+# does one exactly-sized allocation instead of f-string resize-doubling on
+# large snippets.
+_USER_PRE = "Review the following code:\n\n```\n"
+_USER_POST = "\n```"
+
+
+# Shape we expect each review object to have. When fastjsonschema is
+# installed it compiles this to a generated-Python validator at import time
+# (~10x faster than jsonschema), catching model drift with a clear error
+# instead of a KeyError deep in parsing. Absent, we skip validation.
+REVIEW_SCHEMA = {
+    "type": "object",
+    "required": ["language", "categories", "overall_score", "tldr"],
+    "properties": {
+        "language": {"type": "string"},
+        "categories": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "required": ["category", "score", "summary"],
+                "properties": {
+                    "category": {"type": "string"},
+                    "score": {"type": "number"},
+                    "summary": {"type": "string"},
+                    "suggestions": {"type": "array", "items": {"type": "string"}},
+                },
+            },
+        },
+        "overall_score": {"type": "number"},
+        "tldr": {"type": "string"},
+    },
+}
+
+try:
+    import fastjsonschema
+
+    _validate = fastjsonschema.compile(REVIEW_SCHEMA)
+except ImportError:
+    _validate = None
+
+
+_get_category_fields = itemgetter("category", "score", "summary")
+
+
+def _parse_result(data: dict, raw: str) -> ReviewResult:
+    """Build a ReviewResult from one parsed review object."""
+    if _validate is not None:
+        _validate(data)
+
+    # One C-level multi-key fetch per category instead of three dict lookups
+    categories = []
+    for cat in data["categories"]:
+        name, score, summary = _get_category_fields(cat)
+        suggestions = cat.get("suggestions")
+        # Hand the constructor a tuple directly so __post_init__'s isinstance
+        # check short-circuits instead of re-converting a list; missing or
+        # empty suggestions reuse the shared empty tuple.
+        categories.append(
+            CategoryFeedback(name, int(score), summary, tuple(suggestions) if suggestions else ())
+        )
+
+    return ReviewResult(
+        language=data.get("language", "Unknown"),
+        categories=categories,
+        overall_score=round(float(data["overall_score"]), 1),
+        tldr=data.get("tldr", ""),
+        raw_response=raw,
+    )
+
+
+class _JsonDepthTracker:
+    """Track top-level JSON object depth across streamed chunks.
+
+    A three-state automaton (in_string / escape / depth) that ignores braces
+    inside string literals; ``complete`` flips once the first top-level object
+    closes, letting the streaming loop stop early.
+    """
+
+    __slots__ = ("depth", "in_string", "escape", "opened", "complete")
+
+    def __init__(self) -> None:
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+        self.opened = False
+        self.complete = False
+
+    def feed(self, chunk: str) -> None:
+        for ch in chunk:
+            if self.escape:
+                self.escape = False
+            elif self.in_string:
+                if ch == "\\":
+                    self.escape = True
+                elif ch == '"':
+                    self.in_string = False
+            elif ch == '"':
+                self.in_string = True
+            elif ch == "{":
+                self.depth += 1
+                self.opened = True
+            elif ch == "}":
+                self.depth -= 1
+                if self.opened and self.depth == 0:
+                    self.complete = True
+                    return
 
 
 def review_code(code: str, *, model_name: str = "llama-3.3-70b-versatile") -> ReviewResult:
@@ -141,33 +416,177 @@ def review_code(code: str, *, model_name: str = "llama-3.3-70b-versatile") -> Re
     if _client is None:
         raise RuntimeError("Call configure_groq(api_key) first.")
 
+    code = _truncate_code(code)
+    normalized = _normalize_code(code)
+    key = _cache_key(model_name, normalized)
+    with _review_cache_lock:
+        cached = _review_cache.get(key)
+        if cached is not None:
+            _review_cache.move_to_end(key)
+            return cached
+
+    fingerprint = _simhash(normalized) if _FUZZY_CACHE else 0
+    if _FUZZY_CACHE:
+        fuzzy_key = _fuzzy_lookup(fingerprint)
+        if fuzzy_key is not None:
+            with _review_cache_lock:
+                if fuzzy_key in _review_cache:
+                    _review_cache.move_to_end(fuzzy_key)
+                    return _review_cache[fuzzy_key]
+
+    # Stream the completion and parse as soon as the top-level JSON object
+    # closes — no need to wait for (or generate) trailing tokens. JSON mode
+    # (response_format) cannot be combined with streaming on Groq, so this
+    # path relies on the prompt plus the fence-stripping fallback in
+    # _parse_response for well-formed output.
+    stream = _client.chat.completions.create(
+        model=model_name,
+        messages=[
+            _SYSTEM_MSG,
+            {"role": "user", "content": "".join((_USER_PRE, code, _USER_POST))},
+        ],
+        temperature=0.3,
+        max_tokens=1024,
+        stream=True,
+    )
+
+    parts: list[str] = []
+    tracker = _JsonDepthTracker()
+    for chunk in stream:
+        if not chunk.choices:
+            continue
+        delta = chunk.choices[0].delta.content
+        if not delta:
+            continue
+        parts.append(delta)
+        tracker.feed(delta)
+        if tracker.complete:
+            stream.close()
+            break
+
+    raw = "".join(parts)
+    result = _parse_result(_parse_response(raw), raw)
+
+    with _review_cache_lock:
+        _review_cache[key] = result
+        if len(_review_cache) > _CACHE_MAX:
+            _review_cache.popitem(last=False)
+        if _FUZZY_CACHE:
+            _fuzzy_index.append((fingerprint, key))
+            if len(_fuzzy_index) > _CACHE_MAX:
+                del _fuzzy_index[0]
+    return result
+
+
+# Reviewing N snippets one request at a time costs N HTTP round-trips; batching
+# them into a single chat request amortises TLS/queueing over all of them.
+# Chunked so a batch never blows the completion token budget.
+_BATCH_CHUNK = 8
+
+BATCH_SYSTEM_PROMPT = SYSTEM_PROMPT + textwrap.dedent("""\
+
+
+    **Batch mode:** The user message contains several snippets, each headed
+    "### Snippet N". Return a JSON ARRAY with exactly one review object (in
+    the schema above) per snippet, in the same order. Respond ONLY with the
+    JSON array, nothing else.
+""")
+
+_BATCH_SYSTEM_MSG = {"role": "system", "content": BATCH_SYSTEM_PROMPT}
+
+
+def review_codes(codes: list[str], *, model_name: str = "llama-3.3-70b-versatile") -> list[ReviewResult]:
+    """Review several snippets in one Groq request and return their results in order."""
+    if _client is None:
+        raise RuntimeError("Call configure_groq(api_key) first.")
+    if not codes:
+        return []
+    codes = [_truncate_code(code) for code in codes]
+    if len(codes) > _BATCH_CHUNK:
+        results: list[ReviewResult] = []
+        for i in range(0, len(codes), _BATCH_CHUNK):
+            results.extend(review_codes(codes[i : i + _BATCH_CHUNK], model_name=model_name))
+        return results
+
+    sections = "\n\n".join(
+        f"### Snippet {i}\n```\n{code}\n```" for i, code in enumerate(codes, 1)
+    )
     response = _client.chat.completions.create(
         model=model_name,
         messages=[
-            {"role": "system", "content": SYSTEM_PROMPT},
-            {"role": "user", "content": f"Review the following code:\n\n```\n{code}\n```"},
+            _BATCH_SYSTEM_MSG,
+            {
+                "role": "user",
+                "content": f"Review the following {len(codes)} code snippets:\n\n{sections}",
+            },
         ],
         temperature=0.3,
         max_tokens=4096,
     )
 
     raw = response.choices[0].message.content
-    data = _extract_json(raw)
-
-    categories = [
-        CategoryFeedback(
-            category=cat["category"],
-            score=int(cat["score"]),
-            summary=cat["summary"],
-            suggestions=cat.get("suggestions", []),
+    items = _parse_response(raw)
+    if not isinstance(items, list):
+        raise ValueError(
+            f"Expected a JSON array of {len(codes)} reviews, got: {type(items).__name__}"
         )
-        for cat in data["categories"]
-    ]
+    if len(items) != len(codes):
+        raise ValueError(
+            f"Expected a JSON array of {len(codes)} reviews, got {len(items)}"
+        )
+    return [_parse_result(item, raw) for item in items]
 
-    return ReviewResult(
-        language=data.get("language", "Unknown"),
-        categories=categories,
-        overall_score=round(float(data["overall_score"]), 1),
-        tldr=data.get("tldr", ""),
-        raw_response=raw,
+
+async def review_code_async(code: str, *, model_name: str = "llama-3.3-70b-versatile") -> ReviewResult:
+    """Async counterpart of review_code, sharing its in-process cache."""
+    if _aclient is None:
+        raise RuntimeError("Call configure_groq_async(api_key) first.")
+
+    code = _truncate_code(code)
+    normalized = _normalize_code(code)
+    key = _cache_key(model_name, normalized)
+    with _review_cache_lock:
+        cached = _review_cache.get(key)
+        if cached is not None:
+            _review_cache.move_to_end(key)
+            return cached
+
+    response = await _aclient.chat.completions.create(
+        model=model_name,
+        messages=[
+            _SYSTEM_MSG,
+            {"role": "user", "content": "".join((_USER_PRE, code, _USER_POST))},
+        ],
+        temperature=0.3,
+        max_tokens=1024,
+        response_format={"type": "json_object"},
     )
+
+    raw = response.choices[0].message.content
+    result = _parse_result(_parse_response(raw), raw)
+
+    with _review_cache_lock:
+        _review_cache[key] = result
+        if len(_review_cache) > _CACHE_MAX:
+            _review_cache.popitem(last=False)
+    return result
+
+
+async def review_many(
+    codes: list[str],
+    *,
+    model_name: str = "llama-3.3-70b-versatile",
+    max_concurrency: int = 8,
+) -> list[ReviewResult]:
+    """Review many snippets concurrently, overlapping their network round-trips.
+
+    Concurrency is bounded by a semaphore so a big batch doesn't trip Groq's
+    rate limits. Results come back in input order.
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def _bounded(code: str) -> ReviewResult:
+        async with semaphore:
+            return await review_code_async(code, model_name=model_name)
+
+    return list(await asyncio.gather(*(_bounded(code) for code in codes)))
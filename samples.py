@@ -2,7 +2,11 @@
 Sample code snippets for the Smart Code Reviewer demo.
 """
 
-SAMPLES: dict[str, dict[str, str]] = {
+import hashlib
+import sys
+from types import MappingProxyType
+
+_SAMPLES: dict[str, dict[str, str]] = {
     "Python – Clean Example": {
         "language": "python",
         "code": '''\
@@ -159,3 +163,20 @@ public class ConfigManager {
 ''',
     },
 }
+
+# Intern the short language tags (identity-comparable in downstream dispatch)
+# and expose the samples read-only: safe to share across threads, and nothing
+# can mutate them out from under SAMPLE_HASHES.
+for _sample in _SAMPLES.values():
+    _sample["language"] = sys.intern(_sample["language"])
+
+SAMPLES: MappingProxyType[str, MappingProxyType[str, str]] = MappingProxyType(
+    {name: MappingProxyType(sample) for name, sample in _SAMPLES.items()}
+)
+
+# Sample content is frozen, so their cache hashes are known at import time —
+# demo flows can look these up instead of rehashing kilobytes of source.
+SAMPLE_HASHES: dict[str, str] = {
+    name: hashlib.sha256(sample["code"].encode()).hexdigest()
+    for name, sample in SAMPLES.items()
+}